@@ -1,63 +1,103 @@
+import sys
 import unittest
-from copy import deepcopy
 
 import wordsearch_generator as wg
+from itertools import chain
 from random import seed
+from string import ascii_lowercase
 
 
 class CreateEmptyGridTestCase(unittest.TestCase):
     def test_zero_dimensions(self):
-        self.assertEqual([], wg.create_empty_grid(0, 0))
+        self.assertEqual([], wg.grid_to_rows(wg.create_empty_grid(0, 0)))
 
     def test_zero_height(self):
-        self.assertEqual([], wg.create_empty_grid(4, 0))
+        self.assertEqual([], wg.grid_to_rows(wg.create_empty_grid(4, 0)))
 
     def test_zero_width(self):
-        self.assertEqual([[] for _ in range(4)], wg.create_empty_grid(0, 4))
+        self.assertEqual([[] for _ in range(4)], wg.grid_to_rows(wg.create_empty_grid(0, 4)))
 
     def test_unit_dimensions(self):
-        self.assertEqual([[None]], wg.create_empty_grid(1, 1))
+        self.assertEqual([[None]], wg.grid_to_rows(wg.create_empty_grid(1, 1)))
 
     def test_square(self):
-        self.assertEqual([[None] * 4] * 4, wg.create_empty_grid(4, 4))
+        self.assertEqual([[None] * 4] * 4, wg.grid_to_rows(wg.create_empty_grid(4, 4)))
 
     def test_wide_rectangle(self):
-        self.assertEqual([[None] * 5] * 4, wg.create_empty_grid(5, 4))
+        self.assertEqual([[None] * 5] * 4, wg.grid_to_rows(wg.create_empty_grid(5, 4)))
 
     def test_tall_rectangle(self):
-        self.assertEqual([[None] * 4] * 5, wg.create_empty_grid(4, 5))
+        self.assertEqual([[None] * 4] * 5, wg.grid_to_rows(wg.create_empty_grid(4, 5)))
+
+
+class GridRowsTestCase(unittest.TestCase):
+    def test_round_trip(self):
+        rows = [['a', None, 'c'],
+                [None, 'e', None]]
+        self.assertEqual(rows, wg.grid_to_rows(wg.grid_from_rows(rows)))
+
+    def test_buffer_layout(self):
+        grid = wg.grid_from_rows([['a', None],
+                                  ['c', 'd']])
+        self.assertEqual(wg.Grid(2, 2, bytearray(b"a\0cd")), grid)
+
+    def test_copy_grid(self):
+        grid = wg.grid_from_rows([['a', None]])
+        copy = wg.copy_grid(grid)
+        copy.buf[1] = ord('b')
+        self.assertEqual([['a', None]], wg.grid_to_rows(grid))
+        self.assertEqual([['a', 'b']], wg.grid_to_rows(copy))
+
+    def test_wrong_buffer_size(self):
+        with self.assertRaises(ValueError):
+            wg.Grid(2, 2, bytearray(3))
+
+
+class EncodeWordTestCase(unittest.TestCase):
+    def test_ascii(self):
+        self.assertEqual(b"cat", wg.encode_word("cat"))
+
+    def test_non_ascii(self):
+        with self.assertRaises(ValueError):
+            wg.encode_word("caf\u00e9")
 
 
 class GridToStrTestCase(unittest.TestCase):
     def test_zero_dimensions(self):
-        self.assertEqual("", wg.grid_to_str([]))
+        self.assertEqual("", wg.grid_to_str(wg.grid_from_rows([])))
 
     def test_zero_width(self):
         grid = [[] for _ in range(4)]
-        self.assertEqual("", wg.grid_to_str(grid))
+        self.assertEqual("", wg.grid_to_str(wg.grid_from_rows(grid)))
 
     def test_zero_height(self):
-        self.assertEqual("", wg.grid_to_str([]))
+        self.assertEqual("", wg.grid_to_str(wg.grid_from_rows([])))
 
     def test_square(self):
         grid = [['a', 'b', 'c'],
                 ['d', 'e', 'f'],
                 ['g', 'h', 'i']]
         expected = "a b c\nd e f\ng h i"
-        self.assertEqual(expected, wg.grid_to_str(grid))
+        self.assertEqual(expected, wg.grid_to_str(wg.grid_from_rows(grid)))
 
     def test_wide_rect(self):
         grid = [['a', 'b', 'c'],
                 ['d', 'e', 'f']]
         expected = "a b c\nd e f"
-        self.assertEqual(expected, wg.grid_to_str(grid))
+        self.assertEqual(expected, wg.grid_to_str(wg.grid_from_rows(grid)))
 
     def test_tall_rect(self):
         grid = [['a', 'b'],
                 ['c', 'd'],
                 ['e', 'f']]
         expected = "a b\nc d\ne f"
-        self.assertEqual(expected, wg.grid_to_str(grid))
+        self.assertEqual(expected, wg.grid_to_str(wg.grid_from_rows(grid)))
+
+    def test_blanks(self):
+        grid = [['a', None],
+                [None, 'd']]
+        expected = "a .\n. d"
+        self.assertEqual(expected, wg.grid_to_str(wg.grid_from_rows(grid)))
 
 
 class FillBlanksRandomlyTestCase(unittest.TestCase):
@@ -66,21 +106,54 @@ class FillBlanksRandomlyTestCase(unittest.TestCase):
         char = wg.get_random_char()
         self.assertTrue(97 <= ord(char) <= 122)
 
+    def test_get_random_letters(self):
+        seed(112342)
+        letters = wg.get_random_letters(1000)
+        self.assertEqual(1000, len(letters))
+        self.assertTrue(all(97 <= c <= 122 for c in letters))
+
     def test_fill_blanks_randomly(self):
-        grid = [[None, 'b', None],
-                ['d', None, 'f'],
-                [None, None, 'i']]
+        grid = wg.grid_from_rows([[None, 'b', None],
+                                  ['d', None, 'f'],
+                                  [None, None, 'i']])
 
         wg.fill_blanks_randomly(grid)
-        for r, row in enumerate(grid):
+        for r, row in enumerate(wg.grid_to_rows(grid)):
             for c, element in enumerate(row):
                 with self.subTest(msg=f"Check that element at ({c}, {r}) is not None"):
                     self.assertTrue(element is not None)
 
+    def test_fill_blanks_keeps_letters(self):
+        grid = wg.grid_from_rows([[None, 'B', None],
+                                  ['D', None, 'F'],
+                                  [None, None, 'I']])
+
+        wg.fill_blanks_randomly(grid)
+        rows = wg.grid_to_rows(grid)
+        for x, y, char in (1, 0, 'B'), (0, 1, 'D'), (2, 1, 'F'), (2, 2, 'I'):
+            with self.subTest(msg=f"Check that element at ({x}, {y}) is unchanged"):
+                self.assertEqual(char, rows[y][x])
+        for x, y in (0, 0), (2, 0), (1, 1), (0, 2), (1, 2):
+            with self.subTest(msg=f"Check that element at ({x}, {y}) is a random lowercase letter"):
+                self.assertTrue('a' <= rows[y][x] <= 'z')
+
+    def test_fill_blanks_batch(self):
+        grids = [wg.grid_from_rows([[None, 'B'],
+                                    ['C', None]]),
+                 wg.grid_from_rows([[None, None, 'Z']])]
+
+        wg.fill_blanks_batch(grids)
+        self.assertEqual('B', wg.grid_to_rows(grids[0])[0][1])
+        self.assertEqual('C', wg.grid_to_rows(grids[0])[1][0])
+        self.assertEqual('Z', wg.grid_to_rows(grids[1])[0][2])
+        for i, grid in enumerate(grids):
+            with self.subTest(msg=f"Check that grid {i} has no blanks"):
+                self.assertNotIn(wg.BLANK, grid.buf)
+
 
 class InsertSingleWordsTestCase(unittest.TestCase):
     def test_horizontal_normal(self):
-        grid = [[None] * 4 for _ in range(4)]
+        grid = wg.grid_from_rows([[None] * 4 for _ in range(4)])
         expected = [['b', 'a', 'c', 'k'],
                     [None] * 4,
                     [None] * 4,
@@ -89,10 +162,10 @@ class InsertSingleWordsTestCase(unittest.TestCase):
         inserted_correctly = wg.insert_word_horizontally(grid, "back", 0, 0)
 
         self.assertTrue(inserted_correctly)
-        self.assertEqual(expected, grid)
+        self.assertEqual(expected, wg.grid_to_rows(grid))
 
     def test_vertical_normal(self):
-        grid = [[None] * 4 for _ in range(4)]
+        grid = wg.grid_from_rows([[None] * 4 for _ in range(4)])
         expected = [['b', None, None, None],
                     ['a', None, None, None],
                     ['c', None, None, None],
@@ -101,13 +174,13 @@ class InsertSingleWordsTestCase(unittest.TestCase):
         inserted_correctly = wg.insert_word_vertically(grid, "back", 0, 0)
 
         self.assertTrue(inserted_correctly)
-        self.assertEqual(expected, grid)
+        self.assertEqual(expected, wg.grid_to_rows(grid))
 
     def test_horizontal_overlap(self):
-        grid = [['b', None, None, None],
-                ['a', None, None, None],
-                ['c', None, None, None],
-                ['k', None, None, None]]
+        grid = wg.grid_from_rows([['b', None, None, None],
+                                  ['a', None, None, None],
+                                  ['c', None, None, None],
+                                  ['k', None, None, None]])
         expected = [['b', 'a', 'c', 'k'],
                     ['a', None, None, None],
                     ['c', None, None, None],
@@ -116,13 +189,13 @@ class InsertSingleWordsTestCase(unittest.TestCase):
         inserted_correctly = wg.insert_word_horizontally(grid, "back", 0, 0)
 
         self.assertTrue(inserted_correctly)
-        self.assertEqual(expected, grid)
+        self.assertEqual(expected, wg.grid_to_rows(grid))
 
     def test_vertical_overlap(self):
-        grid = [['b', 'a', 'c', 'k'],
-                [None] * 4,
-                [None] * 4,
-                [None] * 4]
+        grid = wg.grid_from_rows([['b', 'a', 'c', 'k'],
+                                  [None] * 4,
+                                  [None] * 4,
+                                  [None] * 4])
         expected = [['b', 'a', 'c', 'k'],
                     ['a', None, None, None],
                     ['c', None, None, None],
@@ -131,36 +204,47 @@ class InsertSingleWordsTestCase(unittest.TestCase):
         inserted_correctly = wg.insert_word_vertically(grid, "back", 0, 0)
 
         self.assertTrue(inserted_correctly)
-        self.assertEqual(expected, grid)
+        self.assertEqual(expected, wg.grid_to_rows(grid))
 
     def test_horizontal_overwrite(self):
-        grid = [['q', None, None, None],
-                ['a', None, None, None],
-                ['c', None, None, None],
-                ['k', None, None, None]]
-        expected = deepcopy(grid)
+        grid = wg.grid_from_rows([['q', None, None, None],
+                                  ['a', None, None, None],
+                                  ['c', None, None, None],
+                                  ['k', None, None, None]])
+        expected = wg.grid_to_rows(grid)
 
         inserted_correctly = wg.insert_word_horizontally(grid, "back", 0, 0)
 
         self.assertFalse(inserted_correctly)
-        self.assertEqual(expected, grid)
+        self.assertEqual(expected, wg.grid_to_rows(grid))
 
     def test_vertical_overwrite(self):
-        grid = [['q', 'a', 'c', 'k'],
-                [None] * 4,
-                [None] * 4,
-                [None] * 4]
-        expected = deepcopy(grid)
+        grid = wg.grid_from_rows([['q', 'a', 'c', 'k'],
+                                  [None] * 4,
+                                  [None] * 4,
+                                  [None] * 4])
+        expected = wg.grid_to_rows(grid)
 
         inserted_correctly = wg.insert_word_vertically(grid, "back", 0, 0)
 
         self.assertFalse(inserted_correctly)
-        self.assertEqual(expected, grid)
+        self.assertEqual(expected, wg.grid_to_rows(grid))
+
+    def test_out_of_bounds(self):
+        grid = wg.create_empty_grid(3, 2)
+
+        with self.assertRaises(IndexError):
+            wg.insert_word_horizontally(grid, "abc", 2, 1)
+        with self.assertRaises(IndexError):
+            wg.insert_word_horizontally(grid, "abc", 2, 0)
+        with self.assertRaises(IndexError):
+            wg.insert_word_vertically(grid, "abc", 0, 0)
+        self.assertEqual(wg.create_empty_grid(3, 2), grid)
 
 
 class IterateWordSpacesTestCase(unittest.TestCase):
     def test_normal(self):
-        grid = [[None] * 4 for _ in range(4)]
+        grid = wg.grid_from_rows([[None] * 4 for _ in range(4)])
         expected_grids = [
             [['c', 'a', 't', None],
              [None] * 4,
@@ -188,29 +272,111 @@ class IterateWordSpacesTestCase(unittest.TestCase):
              [None, None, None, 't']]
         ]
 
-        actual_grids = list(wg.iterate_word_spaces(grid, "cat"))
+        actual_grids = [wg.grid_to_rows(g) for g in wg.iterate_word_spaces(grid, "cat")]
 
         for i, expected_grid in enumerate(expected_grids):
             with self.subTest(msg=f"Check that grid {i} is yielded"):
                 self.assertIn(expected_grid, actual_grids)
 
     def test_zero_width(self):
-        grid = [[] for _ in range(4)]
+        grid = wg.grid_from_rows([[] for _ in range(4)])
         grids_generated = list(wg.iterate_word_spaces(grid, "cat"))
         self.assertEqual(0, len(grids_generated))
 
     def test_zero_height(self):
-        grid = []
+        grid = wg.grid_from_rows([])
         grids_generated = list(wg.iterate_word_spaces(grid, "cat"))
         self.assertEqual(0, len(grids_generated))
 
+    def test_matches_single_insertions(self):
+        """Test that iterate_word_spaces yields exactly the spaces accepted by insert_word_horizontally and
+        insert_word_vertically"""
+        rows = [['c', None, None, 'x', None],
+                [None, 'a', None, None, None],
+                ['x', None, 't', None, 'c'],
+                [None, None, None, None, 'a']]
+        grid = wg.grid_from_rows(rows)
+
+        expected_grids = []
+        for insert, max_x, max_y in (wg.insert_word_horizontally, 2, 3), (wg.insert_word_vertically, 4, 1):
+            for x in range(max_x + 1):
+                for y in range(max_y + 1):
+                    temp_grid = wg.grid_from_rows(rows)
+                    if insert(temp_grid, "cat", x, y):
+                        expected_grids.append(wg.grid_to_rows(temp_grid))
+
+        actual_grids = [wg.grid_to_rows(g) for g in wg.iterate_word_spaces(grid, "cat")]
+
+        self.assertCountEqual(expected_grids, actual_grids)
+
+    def test_transposed_grid(self):
+        """Test that the vertical spaces of a grid match the horizontal spaces of its transpose"""
+        rows = [['c', None, None, 'x', None],
+                [None, 'a', None, None, None],
+                ['x', None, 't', None, 'c'],
+                [None, None, None, None, 'a']]
+        transposed_rows = [list(column) for column in zip(*rows)]
+
+        grid = wg.grid_from_rows(rows)
+        transposed_grid = wg.grid_from_rows(transposed_rows)
+
+        grids = [wg.grid_to_rows(g) for g in wg.iterate_word_spaces(grid, "cat")]
+        transposed_grids = [wg.grid_to_rows(g) for g in wg.iterate_word_spaces(transposed_grid, "cat")]
+
+        self.assertCountEqual(grids, [[list(column) for column in zip(*g)] for g in transposed_grids])
+
+    def test_duplicate_grids_skipped(self):
+        """Test that two spaces which give the same grid are only yielded once"""
+        grid = wg.grid_from_rows([['a', None, 'a']])
+
+        for generator in wg.iterate_word_spaces, wg.iterate_word_spaces_randomly:
+            with self.subTest(msg=f"Test {generator.__name__}"):
+                actual_grids = [wg.grid_to_rows(g) for g in generator(grid, "aa")]
+                self.assertEqual([[['a', 'a', 'a']]], actual_grids)
+
+    def test_most_crossings_first(self):
+        """Test that the spaces crossing the most letters are yielded first"""
+        grid = wg.grid_from_rows([['c', None, None, 'c', 'a', None]])
+        actual_grids = [wg.grid_to_rows(g) for g in wg.iterate_word_spaces(grid, "cat")]
+        self.assertEqual([[['c', None, None, 'c', 'a', 't']], [['c', 'a', 't', 'c', 'a', None]]], actual_grids)
+
+        grid = wg.grid_from_rows([['c', None, None, None],
+                                  ['a', None, None, None],
+                                  ['t', None, None, None],
+                                  [None, 'c', 'a', None]])
+        first_grid = wg.grid_to_rows(next(wg.iterate_word_spaces(grid, "cat")))
+        self.assertEqual(wg.grid_to_rows(grid), first_grid)
+
+    def test_single_letter_word(self):
+        """Test that a one-letter word is only yielded once in each cell, although it fits both ways round"""
+        grid = wg.grid_from_rows([[None, None]])
+
+        for generator in wg.iterate_word_spaces, wg.iterate_word_spaces_randomly:
+            with self.subTest(msg=f"Test {generator.__name__}"):
+                actual_grids = [wg.grid_to_rows(g) for g in generator(grid, "a")]
+                self.assertCountEqual([[['a', None]], [[None, 'a']]], actual_grids)
+
+    def test_grid_restored(self):
+        """Test that the grid is left unchanged once the generators are exhausted"""
+        grid = wg.grid_from_rows([['c', None, None, None],
+                                  [None] * 4,
+                                  [None] * 4,
+                                  [None] * 4])
+        expected = wg.grid_to_rows(grid)
+
+        for generator in wg.iterate_word_spaces, wg.iterate_word_spaces_randomly:
+            with self.subTest(msg=f"Test {generator.__name__}"):
+                for _ in generator(grid, "cat"):
+                    pass
+                self.assertEqual(expected, wg.grid_to_rows(grid))
+
     def test_iterate_word_spaces_randomly(self):
         """Test that iterate_word_spaces_randomly produces the same output as iterate_word_spaces (not necessarily in
         the same order)"""
-        grid = [[None] * 4 for _ in range(4)]
+        grid = wg.grid_from_rows([[None] * 4 for _ in range(4)])
 
-        non_random_grids = wg.iterate_word_spaces(grid, "cat")
-        random_grids = list(wg.iterate_word_spaces_randomly(grid, "cat"))
+        non_random_grids = [wg.grid_to_rows(g) for g in wg.iterate_word_spaces(grid, "cat")]
+        random_grids = [wg.grid_to_rows(g) for g in wg.iterate_word_spaces_randomly(grid, "cat")]
 
         for i, grid in enumerate(non_random_grids):
             with self.subTest(msg=f"Test grid {i} is present"):
@@ -219,17 +385,71 @@ class IterateWordSpacesTestCase(unittest.TestCase):
 
 class InsertAllWordsTestCase(unittest.TestCase):
     def test_insert_words_succeeds(self):
-        grid = [[None] * 4 for _ in range(4)]
+        grid = wg.grid_from_rows([[None] * 4 for _ in range(4)])
         words = ["cat", "mad", "stun", "put", "ban"]
         generated_grid = wg.insert_words(grid, words)
         self.assertTrue(generated_grid is not None)
 
     def test_insert_words_randomly_succeeds(self):
-        grid = [[None] * 4 for _ in range(4)]
+        grid = wg.grid_from_rows([[None] * 4 for _ in range(4)])
         words = ["cat", "mad", "stun", "put", "ban"]
         generated_grid = wg.insert_words_randomly(grid, words)
         self.assertTrue(generated_grid is not None)
 
+    def test_insert_words_parallel_succeeds(self):
+        grid = wg.grid_from_rows([[None] * 4 for _ in range(4)])
+        words = ["cat", "mad", "stun", "put", "ban"]
+        generated_grid = wg.insert_words_parallel(grid, words, workers=2)
+        self.assertTrue(generated_grid is not None)
+
+    def test_insert_words_parallel_no_solution(self):
+        grid = wg.grid_from_rows([[None] * 2 for _ in range(2)])
+        generated_grid = wg.insert_words_parallel(grid, ["cat"], workers=2)
+        self.assertIsNone(generated_grid)
+
+    def test_insert_words_no_solution(self):
+        grid = wg.grid_from_rows([[None] * 3 for _ in range(5)])
+        words = ["baaa", "baba", "abb", "baaa", "aaa", "bbaa", "aaaa", "aaa", "bbbb"]
+        self.assertIsNone(wg.insert_words(grid, words))
+        self.assertIsNone(wg.insert_words_randomly(grid, words))
+
+    def test_insert_words_more_than_recursion_limit(self):
+        # the backtracking uses its own stack, so the number of words isn't limited by the recursion limit
+        grid = wg.grid_from_rows([[None] * 6 for _ in range(6)])
+        words = [ascii_lowercase[i % 26] for i in range(sys.getrecursionlimit() + 500)]
+        generated_grid = wg.insert_words(grid, words)
+        self.assertTrue(generated_grid is not None)
+        self.assertEqual(set(ascii_lowercase), set(chain.from_iterable(wg.grid_to_rows(generated_grid))) - {None})
+
+    def test_insert_words_not_in_place(self):
+        grid = wg.grid_from_rows([[None] * 4 for _ in range(4)])
+        words = ["cat", "mad", "stun", "put", "ban"]
+        wg.insert_words(grid, words)
+        self.assertEqual([[None] * 4] * 4, wg.grid_to_rows(grid))
+
+
+
+class OrderWordsTestCase(unittest.TestCase):
+    def test_longest_first(self):
+        self.assertEqual(["abcd", "abc", "ab", "a"], wg._order_words(["ab", "a", "abcd", "abc"]))
+
+    def test_common_letters_first(self):
+        # the three-letter words have the same length, so the ones made of the most common letters come first
+        self.assertEqual(["abcd", "eee", "bed", "xyz"], wg._order_words(["xyz", "bed", "abcd", "eee"]))
+
+    def test_randomly_shuffles_within_lengths(self):
+        seed(112342)
+        words = ["ab", "abc", "cd", "a", "bcd", "ef", "cde", "gh"]
+        orders = set()
+        for _ in range(20):
+            ordered = wg._order_words_randomly(words)
+            self.assertEqual(sorted(words), sorted(ordered))
+            self.assertEqual(["abc", "bcd", "cde"], sorted(ordered[:3]))
+            self.assertEqual(["ab", "cd", "ef", "gh"], sorted(ordered[3:7]))
+            self.assertEqual(["a"], ordered[7:])
+            orders.add(tuple(ordered))
+        self.assertGreater(len(orders), 1)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,8 +1,11 @@
 """Generate wordsearches
 
-Wordsearches are represented as two-dimensional lists e.g.
+Wordsearches are represented by Grid objects, which store the cells row by row in a single flat bytearray. Blank cells
+are stored as 0 and letters are stored as their ASCII codes, so the grid
     [['a', 'b', 'c', 'd'],
      ['e', 'f', 'g', 'h']]
+is stored as Grid(width=4, height=2, buf=bytearray(b'abcdefgh')). Use grid_from_rows() and grid_to_rows() to convert
+between grids and two-dimensional lists, where blank cells are None.
 
 To create a wordsearch, create an empty grid using the create_empty_grid() function, then use the
 insert_words_randomly() or insert_words() functions to populate the grid. Finally, use fill_blanks_randomly() to fill in
@@ -13,8 +16,53 @@ All the functions that modify the grid do so in-place unless otherwise stated.
 This module also has a command-line interface to generate wordsearches. Run `python wordsearch_generator.py -h` to see
 how to use it.
 """
-from copy import deepcopy
-from random import randint, shuffle
+import os
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import chain, compress
+from multiprocessing import Pool
+from operator import mul, xor
+from random import choice, getrandbits, randrange, seed, shuffle
+from string import ascii_lowercase
+
+BLANK = 0  # the value of a blank cell in Grid.buf, which must be 0 since the SWAR arithmetic treats 0 as blank
+
+# translation table that maps 0 to 1 and every other byte to 0, used on the bytes of SWAR masks (not grid cells),
+# where each byte is either 0 or 0x80
+_ZERO_TO_ONE = bytes([1]) + bytes(255)
+_RANDOM_LETTER_TABLE = bytes(97 + b % 26 for b in range(256))  # translation table from random bytes to letters
+_RANDOM_LETTER_REJECTS = bytes(range(234, 256))  # random bytes to drop, since 234 = 9 * 26 maps evenly onto letters
+_SWAR_CONSTANTS_CACHE_SIZE = 8  # the number of grid sizes kept by _swar_constants()
+_SPACE_LAYOUTS_CACHE_SIZE = 64  # the number of (width, height, word length) results kept by _space_layouts()
+
+
+@dataclass
+class Grid:
+    """A wordsearch grid
+
+    The cell at (x, y) is stored in buf[y * width + x]. A column is read or written with an extended slice such as
+    buf[x::width], which copies the cells in C, so no column-major copy of the grid is kept.
+
+    The buffer is a plain bytearray of uint8 values, so other libraries can use it without copying through the buffer
+    protocol, e.g. numpy.frombuffer(grid.buf, dtype=numpy.uint8).reshape(grid.height, grid.width).
+
+    :param width: The width of the grid
+    :type width: int
+    :param height: The height of the grid
+    :type height: int
+    :param buf: The cells of the grid, stored row by row
+    :type buf: bytearray
+    :raises ValueError: If the length of buf isn't width * height
+    """
+    width: int
+    height: int
+    buf: bytearray
+
+    def __post_init__(self):
+        if len(self.buf) != self.width * self.height:
+            raise ValueError(f"A {self.width}x{self.height} grid needs {self.width * self.height} cells, but the "
+                             f"buffer has {len(self.buf)}")
 
 
 def create_empty_grid(width, height):
@@ -25,53 +73,169 @@ def create_empty_grid(width, height):
     :param height: The height of the grid
     :type height: int
     :return: The empty grid
+    :rtype: Grid
+    """
+    return Grid(width, height, bytearray(width * height))
+
+
+def copy_grid(grid):
+    """Copy a grid
+
+    :param grid: The grid to copy
+    :type grid: Grid
+    :return: A new grid with the same cells
+    :rtype: Grid
+    """
+    return Grid(grid.width, grid.height, bytearray(grid.buf))
+
+
+def grid_from_rows(rows):
+    """Create a grid from a two-dimensional list
+
+    :param rows: The rows of the grid. Each element is a single character, or None for a blank cell.
+    :type rows: list
+    :return: The grid
+    :rtype: Grid
+    """
+    height = len(rows)
+    width = len(rows[0]) if height > 0 else 0
+
+    # build the whole buffer with one encode, rather than assigning the cells one at a time
+    blank = chr(BLANK)
+    text = "".join(blank if char is None else char for row in rows for char in row)
+    return Grid(width, height, bytearray(text.encode("ascii")))
+
+
+def grid_to_rows(grid):
+    """Convert a grid to a two-dimensional list
+
+    :param grid: The grid to convert
+    :type grid: Grid
+    :return: The rows of the grid. Each element is a single character, or None for a blank cell.
     :rtype: list
     """
-    return [[None] * width for _ in range(height)]
+    width = grid.width
+    text = grid.buf.decode("ascii")
+    blank = chr(BLANK)
+    return [[None if char == blank else char for char in text[y * width:(y + 1) * width]] for y in range(grid.height)]
+
+
+def encode_word(word):
+    """Encode a word in the format used by Grid.buf
+
+    :param word: The word to encode
+    :type word: str
+    :return: The encoded word
+    :rtype: bytes
+    :raises ValueError: If the word contains non-ASCII characters
+    """
+    try:
+        return word.encode("ascii")
+    except UnicodeEncodeError:
+        raise ValueError(f"Words can only contain ASCII characters, but got {word!r}") from None
 
 
 def grid_to_str(grid):
     """Convert a grid to a string
 
+    Blank cells are shown as ".".
+
     :param grid: The grid to convert
-    :type grid: list
+    :type grid: Grid
     :return: The string representation
     :rtype: str
     """
-    result = ""
+    width = grid.width
+    if width == 0:
+        return ""
 
-    if len(grid) > 0 and len(grid[0]) > 0:
-        for row in grid:
-            row = [str(c) for c in row]
-            result += " ".join(row) + "\n"
-
-    result = result[:-1]
-    return result
+    # decode the whole buffer once, and build the string with a single join rather than concatenating row by row
+    text = grid.buf.replace(bytes([BLANK]), b".").decode("ascii")
+    return "\n".join(" ".join(text[y * width:(y + 1) * width]) for y in range(grid.height))
 
 
 def get_random_char():
     """Get a random character
 
-    Only lower case characters are returned.
+    Only lower case characters are returned. Use get_random_letters() to get many characters at once.
 
     :return: A single character
     :rtype: str
     """
-    return chr(randint(97, 122))
+    # choice() draws the index directly, which skips the argument checks that randint() does on every call. The
+    # characters aren't buffered, so the result still only depends on the state of the random module.
+    return choice(ascii_lowercase)
+
+
+def get_random_letters(n):
+    """Get a sequence of random characters
+
+    Only lower case characters are returned. This is much faster than calling get_random_char() n times, because the
+    random bits for every character are generated at once.
+
+    :param n: The number of characters to get
+    :type n: int
+    :return: The ASCII codes of the characters
+    :rtype: bytes
+    """
+    letters = b""
+    while len(letters) < n:
+        # Some random bytes are rejected to keep the letters uniform, so draw a few more than are needed.
+        num_bytes = (n - len(letters)) * 9 // 8 + 8
+        random_bytes = getrandbits(8 * num_bytes).to_bytes(num_bytes, "little")
+        letters += random_bytes.translate(_RANDOM_LETTER_TABLE, _RANDOM_LETTER_REJECTS)
+
+    return letters[:n]
 
 
 def fill_blanks_randomly(grid):
     """Fill blank spaces with random characters
 
-    Every element of the grid that is None will be replaced by a random lowercase character.
+    Every blank cell of the grid will be replaced by a random lowercase character.
 
     :param grid: The grid to fill in the blanks of
-    :type grid: list
+    :type grid: Grid
     """
-    for row in grid:
-        for i in range(len(row)):
-            if row[i] is None:
-                row[i] = get_random_char()
+    _fill_blanks(grid, get_random_letters(len(grid.buf)))
+
+
+def fill_blanks_batch(grids):
+    """Fill blank spaces in several grids with random characters
+
+    This works like calling fill_blanks_randomly() on each grid, but the random characters for every grid are drawn at
+    once, which is faster when generating many wordsearches.
+
+    :param grids: The grids to fill in the blanks of
+    :type grids: list
+    """
+    letters = get_random_letters(sum(len(grid.buf) for grid in grids))
+
+    start = 0
+    for grid in grids:
+        stop = start + len(grid.buf)
+        _fill_blanks(grid, letters[start:stop])
+        start = stop
+
+
+def _fill_blanks(grid, letters):
+    """Replace the blank cells of a grid with the corresponding letters
+
+    :param grid: The grid to fill in the blanks of
+    :type grid: Grid
+    :param letters: A letter for every cell of the grid. The letters for the filled cells are ignored.
+    :type letters: bytes
+    """
+    # This merges the letters into the grid at once using SWAR arithmetic (see _find_fitting_starts). The filled
+    # cells are turned into a mask with 0xff in every filled byte, which selects the grid's letters over the new ones.
+
+    buf = grid.buf
+    size = len(buf)
+
+    ones, low, _ = _swar_constants(size)
+    cells = int.from_bytes(buf, "little")
+    filled = ((((cells & low) + low) | cells) >> 7 & ones) * 0xff
+
+    buf[:] = (cells | (int.from_bytes(letters, "little") & ~filled)).to_bytes(size, "little")
 
 
 def insert_word_horizontally(grid, word, x, y):
@@ -83,10 +247,10 @@ def insert_word_horizontally(grid, word, x, y):
     A word will still be inserted if it overlaps another word without overwriting any letters i.e the words can cross at
     a common letter.
 
-    This function does not check if a word is out of the bounds of the grid.
+    The word must lie entirely inside the grid.
 
     :param grid: The grid to insert the word into
-    :type grid: list
+    :type grid: Grid
     :param word: The word to insert
     :type word: str
     :param x: The x coordinate of the first letter (the first column has x coordinate 0)
@@ -95,18 +259,13 @@ def insert_word_horizontally(grid, word, x, y):
     :type y: int
     :return: True if the word was successfully inserted, else False
     :rtype: bool
+    :raises IndexError: If the word would go outside the grid
     """
-    # check if the word fits in this space
-    for i in range(len(word)):
-        grid_char = grid[y][x + i]
-        if grid_char is not None and grid_char != word[i]:
-            return False  # the word doesn't fit into this space
-
-    # insert the word
-    for i in range(len(word)):
-        grid[y][x + i] = word[i]
+    if not (0 <= x and x + len(word) <= grid.width and 0 <= y < grid.height):
+        raise IndexError(f"A word of length {len(word)} at ({x}, {y}) doesn't fit horizontally in a "
+                         f"{grid.width}x{grid.height} grid")
 
-    return True
+    return _insert_word(grid, encode_word(word), y * grid.width + x, 1)
 
 
 def insert_word_vertically(grid, word, x, y):
@@ -118,10 +277,10 @@ def insert_word_vertically(grid, word, x, y):
     A word will still be inserted if it overlaps another word without overwriting any letters i.e the words can cross at
     a common letter.
 
-    This function does not check if a word is out of the bounds of the grid.
+    The word must lie entirely inside the grid.
 
     :param grid: The grid to insert the word into
-    :type grid: list
+    :type grid: Grid
     :param word: The word to insert
     :type word: str
     :param x: The x coordinate of the first letter (the first column has x coordinate 0)
@@ -130,51 +289,218 @@ def insert_word_vertically(grid, word, x, y):
     :type y: int
     :return: True if the word was successfully inserted, else False
     :rtype: bool
+    :raises IndexError: If the word would go outside the grid
     """
-    # check if the word fits in this space
-    for i in range(len(word)):
-        grid_char = grid[y + i][x]
-        if grid_char is not None and grid_char != word[i]:
-            return False
+    if not (0 <= x < grid.width and 0 <= y and y + len(word) <= grid.height):
+        raise IndexError(f"A word of length {len(word)} at ({x}, {y}) doesn't fit vertically in a "
+                         f"{grid.width}x{grid.height} grid")
+
+    return _insert_word(grid, encode_word(word), y * grid.width + x, grid.width)
+
+
+def _insert_word(grid, word, start, stride):
+    """Insert an encoded word into a grid along a line of cells
+
+    This is the implementation of insert_word_horizontally() and insert_word_vertically(). The letters of the word go
+    into grid.buf[start], grid.buf[start + stride], grid.buf[start + 2 * stride] and so on, so a stride of 1 inserts the
+    word horizontally and a stride of grid.width inserts it vertically.
+
+    :param grid: The grid to insert the word into
+    :type grid: Grid
+    :param word: The word to insert, encoded with encode_word()
+    :type word: bytes
+    :param start: The index in grid.buf of the first letter
+    :type start: int
+    :param stride: The distance in grid.buf between consecutive letters
+    :type stride: int
+    :return: True if the word was successfully inserted, else False
+    :rtype: bool
+    """
+    buf = grid.buf
+    stop = start + len(word) * stride
+    cells = buf[start:stop:stride]
+
+    # check if the word fits in this space. A cell clashes with the word if it is non-zero and differs from the word's
+    # letter, i.e. if c * (c ^ w) is non-zero. Using map() with operator functions keeps the loop out of the
+    # interpreter. Most spaces in a sparse grid are blank, and any(cells) rules out a clash in those without building
+    # the maps at all.
+    if any(cells) and any(map(mul, cells, map(xor, cells, word))):
+        return False  # the word doesn't fit into this space
 
     # insert the word
-    for i in range(len(word)):
-        grid[y + i][x] = word[i]
+    buf[start:stop:stride] = word
 
     return True
 
 
+@lru_cache(maxsize=_SWAR_CONSTANTS_CACHE_SIZE)
+def _swar_constants(size):
+    """Get the constants used for SWAR arithmetic on a buffer
+
+    :param size: The length of the buffer in bytes
+    :type size: int
+    :return: The integers with every byte set to 0x01, with every byte set to 0x7f, and with every byte set to 0x80
+    :rtype: tuple
+    """
+    ones = int.from_bytes(b"\x01" * size, "little")
+    return ones, ones * 0x7f, ones << 7
+
+
+@lru_cache(maxsize=_SPACE_LAYOUTS_CACHE_SIZE)
+def _space_layouts(width, height, length):
+    """Get the constants needed to find the spaces for words of one length in grids of one size
+
+    These only depend on the dimensions, so they are worked out once rather than for every word that is inserted. Only
+    the most recently used dimensions are kept, since each result holds integers as large as the grid.
+
+    :param width: The width of the grid
+    :type width: int
+    :param height: The height of the grid
+    :type height: int
+    :param length: The length of the word
+    :type length: int
+    :return: For the horizontal then the vertical spaces: None if the word is too long for the grid, otherwise the
+        shift (in bits) that moves each letter's cell onto the first cell of the space, the range of possible starts,
+        and a SWAR mask with 0x80 in every byte where a space can never start
+    :rtype: tuple
+    """
+    size = width * height
+    layouts = ()
+
+    # horizontal spaces, where the spaces that would wrap onto the next row are ruled out
+    if length > width:
+        layouts += None,
+    else:
+        row = bytes(width - length + 1) + b"\x80" * max(length - 1, 0)
+        layouts += (tuple(8 * i for i in range(length)), range(size), int.from_bytes(row * height, "little")),
+
+    # vertical spaces, where the spaces that would run off the bottom are outside the range of starts
+    if length > height:
+        layouts += None,
+    else:
+        layouts += (tuple(8 * i * width for i in range(length)), range((height - length + 1) * width), 0),
+
+    return layouts
+
+
+def _find_fitting_starts(grid, word):
+    """Find every space in a grid that a word fits into
+
+    The spaces are split into those where the word crosses at least one letter that is already in the grid, and those
+    where every cell under the word is blank.
+
+    :param grid: The grid that the word is being inserted into
+    :type grid: Grid
+    :param word: The word that is being inserted, encoded with encode_word()
+    :type word: bytes
+    :return: The indices in grid.buf of the first letter of each space, as a tuple of (crossing, free horizontal, free
+        vertical) spaces. The free spaces are in increasing order. The crossing spaces of both orientations are in one
+        list, with the size of the grid added to the vertical ones, in decreasing order of the number of letters they
+        cross, then in increasing order.
+    :rtype: tuple
+    """
+    # This checks every space at once using SWAR (SIMD within a register). The whole buffer is loaded into one integer,
+    # so every operation below works on all the cells in parallel. A byte b is non-zero exactly when
+    # ((b & 0x7f) + 0x7f) | b has its top bit set, and the addition never carries into the next byte.
+    #
+    # A cell clashes with a letter if it is filled with a different letter. The clashes are found once for each
+    # distinct letter of the word, since they are the same for both orientations and for repeated letters. Shifting
+    # the clashes for letter i back by i * stride bytes moves them onto the first cell of the space, so after OR-ing
+    # together the clashes for every letter, the word fits wherever the top bit is clear. The filled cells are shifted
+    # in the same way to find the spaces that cross another word.
+    #
+    # The crossing spaces are sorted so that the ones covering the most letters come first. Adding up the filled cells
+    # shifted in the same way (with 0x01 instead of 0x80 in each filled byte) counts the letters under every space at
+    # once, as long as the count can't carry into the next byte, i.e. the word is shorter than 256 letters.
+    #
+    # The top bits of `filled` act as an occupancy bitset for the whole grid, so there is no separate per-row or
+    # per-column bitset. One-bit-per-cell bitboards were tried, but turning the resulting bits back into a list of
+    # starts costs as much as the byte-wide arithmetic saves.
+
+    size = len(grid.buf)
+    length = len(word)
+
+    ones, low, high = _swar_constants(size)
+    cells = int.from_bytes(grid.buf, "little")
+    filled = (((cells & low) + low) | cells) & high
+    filled_ones = filled >> 7
+
+    letter_clashes = {}
+    if filled:  # an empty grid has no clashes or crossings, e.g. for the first word of every search
+        for letter in set(word):
+            diff = cells ^ (letter * ones)
+            letter_clashes[letter] = (((diff & low) + low) | diff) & filled
+
+    crossing = []
+    frees = ()
+    counts = b""
+    for offset, layout in zip((0, size), _space_layouts(grid.width, grid.height, length)):
+        if layout is None:
+            frees += (),
+            counts += bytes(size)
+            continue
+        shifts, starts, clashes = layout
+
+        crosses = 0
+        overlaps = 0
+        if filled:
+            for letter, shift in zip(word, shifts):
+                clashes |= letter_clashes[letter] >> shift
+                crosses |= filled >> shift
+                overlaps += filled_ones >> shift
+
+        crossing += map(offset.__add__, compress(starts, (crosses & ~clashes).to_bytes(size, "little")))
+        frees += tuple(compress(starts, (clashes | crosses).to_bytes(size, "little").translate(_ZERO_TO_ONE))),
+        counts += overlaps.to_bytes(size, "little") if length < 256 else bytes(size)
+
+    # The vertical starts are offset by the size of the grid, so the counts for both orientations are indexed by them.
+    # The sort is stable, so spaces that cross as many letters stay in increasing order, horizontal first.
+    crossing.sort(key=counts.__getitem__, reverse=True)
+
+    free_h, free_v = frees
+    return crossing, free_h, free_v
+
+
 def iterate_word_spaces(grid, word):
     """Iterate over the possible ways to insert a word
 
     This generator yields the grid corresponding to every possible way of inserting the word horizontally or vertically.
     It doesn't yield any grid where characters are overwritten i.e. the word doesn't fit.
 
+    The word is inserted into the grid in-place, and the same grid object is yielded every time. The insertion is undone
+    when the generator is resumed, so the grid must not be modified between iterations, and it should be copied with
+    copy_grid() if it needs to be kept. Once the generator is exhausted, the grid is back in its original state. If the
+    generator is not exhausted, the last yielded word is left in the grid.
+
+    The spaces where the word crosses a letter that is already in the grid are yielded first, in either orientation,
+    starting with the ones that cross the most letters. These leave more room for the words that are inserted later, so
+    they are more likely to lead to a solution.
+
     :param grid: The grid that the word is being inserted into
-    :type grid: list
+    :type grid: Grid
     :param word: The word that is being inserted
     :type word: str
     """
-    height = len(grid)
-    width = len(grid[0]) if height > 0 else 0
+    return _iterate_word_spaces(grid, encode_word(word))
+
 
-    temp_grid = deepcopy(grid)
+def _iterate_word_spaces(grid, word):
+    """Iterate over the possible ways to insert an encoded word
 
-    # horizontal spaces
-    for x in range(width - len(word) + 1):
-        for y in range(height):
-            word_fits = insert_word_horizontally(temp_grid, word, x, y)
-            if word_fits:
-                yield temp_grid
-                temp_grid = deepcopy(grid)  # reset temp_grid so the next word location can be generated
+    This is the implementation of iterate_word_spaces(). It takes a word encoded with encode_word(), so that the
+    backtracker only has to encode each word once.
 
-    # vertical spaces
-    for y in range(height - len(word) + 1):
-        for x in range(width):
-            word_fits = insert_word_vertically(temp_grid, word, x, y)
-            if word_fits:
-                yield temp_grid
-                temp_grid = deepcopy(grid)
+    :param grid: The grid that the word is being inserted into
+    :type grid: Grid
+    :param word: The word that is being inserted
+    :type word: bytes
+    """
+    # The spaces are stored as integers in the same way as in _yield_word_spaces(), so the crossing spaces are tried
+    # first, in the order given by _find_fitting_starts(), followed by the free horizontal then vertical ones.
+    size = len(grid.buf)
+    crossing, free_h, free_v = _find_fitting_starts(grid, word)
+    spaces = chain(map((2 * size).__add__, crossing), free_h, map(size.__add__, free_v))
+    yield from _yield_word_spaces(grid, word, spaces)
 
 
 def iterate_word_spaces_randomly(grid, word):
@@ -183,44 +509,95 @@ def iterate_word_spaces_randomly(grid, word):
     This generator yields the grid corresponding to every possible way of inserting the word horizontally or vertically.
     It doesn't yield any grid where characters are overwritten i.e. the word doesn't fit.
 
+    Like iterate_word_spaces(), the word is inserted in-place and the same grid object is yielded every time.
+
     :param grid: The grid that the word is being inserted into
-    :type grid: list
+    :type grid: Grid
     :param word: The word that is being inserted
     :type word: str
     """
-    # This function works by generating possible locations for the word, shuffling them, then yielding the corresponding
-    # grids with the word inserted.
+    return _iterate_word_spaces_randomly(grid, encode_word(word))
+
+
+def _iterate_word_spaces_randomly(grid, word):
+    """Iterate randomly over the possible ways to insert an encoded word
+
+    This is the implementation of iterate_word_spaces_randomly(), which takes a word encoded with encode_word().
+
+    :param grid: The grid that the word is being inserted into
+    :type grid: Grid
+    :param word: The word that is being inserted
+    :type word: bytes
+    """
+    size = len(grid.buf)
+    crossing, free_h, free_v = _find_fitting_starts(grid, word)
+    spaces = list(chain(free_h, map(size.__add__, free_v), map((2 * size).__add__, crossing)))
+    yield from _yield_word_spaces(grid, word, _shuffled(spaces))
 
-    height = len(grid)
-    width = len(grid[0]) if height > 0 else 0
 
-    # ************** generate spaces ****************
+def _shuffled(items):
+    """Yield the items of a list in a random order
 
-    # horizontal spaces
-    spaces = []
-    for x in range(width - len(word) + 1):
-        for y in range(height):
-            spaces.append((x, y, True))
+    The items are shuffled as they are used, by swapping a randomly chosen item out of the part of the list that hasn't
+    been used yet (a Fisher-Yates shuffle). Once a solution is found the generator is abandoned, usually after only a
+    few spaces, so there is no point shuffling the rest of the list up front.
 
-    # vertical spaces
-    for y in range(height - len(word) + 1):
-        for x in range(width):
-            spaces.append((x, y, False))
+    :param items: The items to shuffle. The list is modified.
+    :type items: list
+    """
+    for i in range(len(items) - 1, -1, -1):
+        j = randrange(i + 1)
+        item = items[j]
+        items[j] = items[i]
+        yield item
 
-    # ************** shuffle spaces ****************
-    shuffle(spaces)
 
-    # **************** yield grids *********************
-    temp_grid = deepcopy(grid)
-    for x, y, horizontal in spaces:
-        if horizontal:
-            word_fits = insert_word_horizontally(temp_grid, word, x, y)
-        else:
-            word_fits = insert_word_vertically(temp_grid, word, x, y)
+def _yield_word_spaces(grid, word, spaces):
+    """Insert an encoded word into each of the given spaces in turn and yield the grid
 
-        if word_fits:
-            yield temp_grid
-            temp_grid = deepcopy(grid)  # reset temp_grid so the next word location can be generated
+    Each space is stored as a single integer instead of a tuple: the start, plus the size of the grid for vertical
+    spaces, plus twice the size of the grid for the spaces that cross another word.
+
+    :param grid: The grid that the word is being inserted into
+    :type grid: Grid
+    :param word: The word that is being inserted
+    :type word: bytes
+    :param spaces: The spaces that the word fits into, as found by _find_fitting_starts()
+    :type spaces: Iterable[int]
+    """
+    buf = grid.buf
+    width = grid.width
+    size = len(buf)
+    length = len(word)
+
+    # The word is already known to fit into these spaces, so it is written without checking the cells again. The
+    # previous contents of the cells are kept so that the insertion can be undone.
+    #
+    # Two different spaces can give the same grid, e.g. when the word is already in the grid in two places, or when a
+    # word with repeated letters is shifted over letters that match. These would lead to identical searches, so each
+    # resulting grid is only yielded once. Only the crossing spaces need checking: filling a blank space adds letters
+    # to exactly those cells, so it gives a different grid to every other space, unless the word is a single letter.
+    #
+    # The stride, span and whether to check for duplicates only depend on the kind of space, so they are looked up.
+    seen = set()
+    check_free = length < 2
+    strides = 1, width, 1, width
+    spans = length, length * width, length, length * width
+    checks = check_free, check_free, True, True
+    for space in spaces:
+        kind, start = divmod(space, size)
+        stride = strides[kind]
+        stop = start + spans[kind]
+        cells = buf[start:stop:stride]
+        buf[start:stop:stride] = word
+        if not checks[kind]:
+            yield grid
+        else:
+            state = bytes(buf)
+            if state not in seen:
+                seen.add(state)
+                yield grid
+        buf[start:stop:stride] = cells  # reset grid so the next word location can be generated
 
 
 def insert_words_randomly(grid, words):
@@ -233,25 +610,69 @@ def insert_words_randomly(grid, words):
     This function does not work in-place. It returns the new grid with the words inserted, or returns None is there is
     no solution.
 
+    The words are not necessarily inserted in the order they are given (see insert_words()).
+
     :param grid: An empty grid to insert the words into
-    :type grid: list
+    :type grid: Grid
     :param words: The words to insert
     :type words: list
     :return: The new grid with the words inserted
-    :rtype: list
+    :rtype: Grid
     """
     # This function works the same as insert_words, but it uses iterate_word_spaces_randomly instead of
-    # iterate_word_spaces.
+    # iterate_word_spaces, and the words of each length are inserted in a random order.
+    return _insert_words(copy_grid(grid), _order_words_randomly(words), _iterate_word_spaces_randomly)
 
-    if len(words) == 0:
-        return grid
 
-    for temp_grid in iterate_word_spaces_randomly(grid, words[0]):
-        temp_grid = insert_words_randomly(temp_grid, words[1:])
-        if temp_grid is not None:
-            return temp_grid
+def insert_words_parallel(grid, words, workers=None):
+    """Insert words randomly into a grid, using several processes
 
-    return None  # There are no possible ways to insert this word, so we backtrack.
+    This works like insert_words_randomly(), but runs an independent random search in each process and returns the
+    result of whichever one finishes first. Each search tries every possible configuration, so they all find a solution
+    if there is one, but some random orders find it much sooner than others. Unlike insert_words_randomly(), the result
+    can differ from run to run even if the random module is seeded, since it depends on which process finishes first.
+
+    This function does not work in-place. It returns the new grid with the words inserted, or returns None is there is
+    no solution.
+
+    :param grid: An empty grid to insert the words into
+    :type grid: Grid
+    :param words: The words to insert
+    :type words: list
+    :param workers: The number of processes to use. Defaults to the number of CPUs.
+    :type workers: int
+    :return: The new grid with the words inserted
+    :rtype: Grid
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if workers == 1:
+        return insert_words_randomly(grid, words)
+
+    # The seeds are drawn from the random module in this process, so that each search tries the spaces in a different
+    # order. The result isn't reproducible, because it depends on which search happens to finish first.
+    tasks = [(grid, words, getrandbits(64)) for _ in range(workers)]
+
+    # Leaving the with block terminates the searches that are still running.
+    with Pool(workers) as pool:
+        for result in pool.imap_unordered(_insert_words_randomly_with_seed, tasks):
+            return result
+
+
+def _insert_words_randomly_with_seed(task):
+    """Seed the random module, then call insert_words_randomly()
+
+    This is the function run by each process in insert_words_parallel().
+
+    :param task: The grid, the words and the seed
+    :type task: tuple
+    :return: The new grid with the words inserted, or None if there is no solution
+    :rtype: Grid
+    """
+    grid, words, random_seed = task
+    seed(random_seed)
+    return insert_words_randomly(grid, words)
 
 
 def insert_words(grid, words):
@@ -264,25 +685,88 @@ def insert_words(grid, words):
     This function does not work in-place. It returns the new grid with the words inserted, or returns None is there is
     no solution.
 
+    The words are not inserted in the order they are given. The words that are hardest to fit are inserted first, so
+    that dead ends are found before much work has been done on the other words. This changes which configuration is
+    found, but not whether one is found.
+
     :param grid: An empty grid to insert the words into
-    :type grid: list
+    :type grid: Grid
     :param words: The words to insert
     :type words: list
     :return: The new grid with the words inserted
-    :rtype: list
+    :rtype: Grid
     """
-    # This function uses a recursive backtracking method. The base case is when there are no more words to insert. It
-    # backtracks when it has gone through all of possible ways to insert the next word.
+    # The grid is copied once here, and the search then works on the copy in-place.
+    return _insert_words(copy_grid(grid), _order_words(words), _iterate_word_spaces)
+
+
+def _insert_words(grid, words, iterate):
+    """Insert words into a grid in-place
+
+    :param grid: The grid to insert the words into
+    :type grid: Grid
+    :param words: The words to insert, in the order to insert them e.g. as sorted by _order_words()
+    :type words: list
+    :param iterate: The generator used to iterate over the ways to insert an encoded word e.g. _iterate_word_spaces
+    :type iterate: function
+    :return: The grid with the words inserted, or None if there is no solution
+    :rtype: Grid
+    """
+    # This function uses a backtracking method with an explicit stack instead of recursion. The stack holds an iterator
+    # for each word that is currently in the grid, and advancing the top iterator moves its word to the next space.
+    # It backtracks by popping an iterator when it has gone through all of the possible ways to insert its word, which
+    # also leaves the grid as it was before that word was inserted.
+    #
+    # When a solution is found, the iterators are abandoned without being resumed, which leaves their words in the grid.
 
     if len(words) == 0:
         return grid
 
-    for temp_grid in iterate_word_spaces(grid, words[0]):
-        temp_grid = insert_words(temp_grid, words[1:])
-        if temp_grid is not None:
-            return temp_grid
+    words = [encode_word(word) for word in words]
+
+    count = len(words)
+    stack = [iterate(grid, words[0])]
+    while stack:
+        if next(stack[-1], None) is None:
+            stack.pop()  # There are no more ways to insert this word, so we backtrack.
+        elif len(stack) == count:
+            return grid
+        else:
+            stack.append(iterate(grid, words[len(stack)]))
+
+    return None
+
 
-    return None  # There are no possible ways to insert this word, so we backtrack.
+def _order_words(words):
+    """Sort words so that the hardest ones to insert come first
+
+    Longer words are harder to insert, because they fit into fewer spaces. Ties are broken by putting the words made of
+    the most common letters first, since they give the later words the most chances to cross them.
+
+    :param words: The words to sort
+    :type words: list
+    :return: The sorted words
+    :rtype: list
+    """
+    letter_counts = Counter(chain.from_iterable(words))
+    return sorted(words, key=lambda word: (-len(word), -sum(letter_counts[c] for c in word)))
+
+
+def _order_words_randomly(words):
+    """Sort words so that the longest ones come first, and shuffle the words of each length
+
+    This is the order used by insert_words_randomly(). Longer words are still inserted first, as in _order_words(), but
+    the words of the same length are not always tried in the same order, so different random searches (e.g. in
+    insert_words_parallel()) explore more varied configurations.
+
+    :param words: The words to sort
+    :type words: list
+    :return: The sorted words
+    :rtype: list
+    """
+    words = list(words)
+    shuffle(words)
+    return sorted(words, key=len, reverse=True)  # the sort is stable, so it keeps the shuffled order within a length
 
 
 def main():
@@ -291,7 +775,7 @@ def main():
     description = """Generate a wordsearch. Only one of --words and words-file should be specified. If --words-file is 
     specified, then the specified text file will be loaded. The text file should contain the words to put in the 
     wordsearch on separate lines. If --words is specified, then all the words should be inputted into the command 
-    line."""
+    line. The words can only contain ASCII characters."""
 
     parser = argparse.ArgumentParser(description=description)
 
@@ -299,6 +783,8 @@ def main():
     parser.add_argument("height", type=int, help="The height of the wordsearch")
     parser.add_argument("--words", type=str, help="The words to appear in the wordsearch", nargs='*')
     parser.add_argument("--words-file", type=str, help="A text file containing the words to appear in the wordsearch")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="The number of processes to search for a wordsearch with (default: 1)")
 
     args = parser.parse_args()
 
@@ -309,6 +795,9 @@ def main():
     if width <= 0 or height <= 0:
         raise ValueError("Width and height must be greater than zero.")
 
+    if args.workers <= 0:
+        raise ValueError("The number of workers must be greater than zero.")
+
     if args.words is None and args.words_file is None:
         raise TypeError("No words have been specified")
     elif args.words is not None and args.words_file is not None:
@@ -324,10 +813,17 @@ def main():
     else:
         words = args.words
 
+    # the grid stores one byte per cell, so only ASCII words can be inserted
+    for word in words:
+        try:
+            encode_word(word)
+        except ValueError as e:
+            parser.error(str(e))
+
     # generate wordsearch
 
     grid = create_empty_grid(width, height)
-    grid = insert_words_randomly(grid, words)
+    grid = insert_words_parallel(grid, words, args.workers)
 
     if grid is None:
         raise RuntimeError("The wordsearch could not be generated. Try using fewer words or larger dimensions.")